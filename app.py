@@ -13,11 +13,27 @@ import base64
 import streamlit.components.v1 as components
 
 # --- Helper Functions ---
+# yfinance logs failed downloads and returns an empty frame instead of raising. Cached
+# downloads raise this on empty results so a transient failure is never cached; it carries
+# the (partial) result for the uncached caller to return.
+class EmptyDownloadError(Exception):
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
 def fetch_data(symbol, start, end, interval="1d"):
+    try:
+        return download_data(symbol, start, end, interval)
+    except EmptyDownloadError as e:
+        return e.result
+
+# Every rerun requests the same symbol/range again; cache downloads briefly
+@st.cache_data(ttl=120, max_entries=256, show_spinner=False)
+def download_data(symbol, start, end, interval="1d"):
     data = yf.download(symbol, start=start, end=end, interval=interval)
     # If no data, return empty DataFrame with OHLCV columns
     if data.empty:
-        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        raise EmptyDownloadError(pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume']))
     # Flatten columns if MultiIndex (e.g., from yfinance)
     if isinstance(data.columns, pd.MultiIndex):
         data.columns = ['_'.join([str(i) for i in col if i]) for col in data.columns.values]
@@ -35,6 +51,27 @@ def fetch_data(symbol, start, end, interval="1d"):
         data = data.rename(columns={f'Close_{symbol}': 'Close'})
     return data
 
+def fetch_data_batch(symbols, start, end, interval="1d"):
+    try:
+        return download_data_batch(symbols, start, end, interval)
+    except EmptyDownloadError as e:
+        return e.result
+
+# Download several symbols at once; yfinance fetches them concurrently on its own worker threads.
+# Only cached when every symbol came back with data.
+@st.cache_data(ttl=120, max_entries=64, show_spinner=False)
+def download_data_batch(symbols, start, end, interval="1d"):
+    data = yf.download(list(symbols), start=start, end=end, interval=interval, group_by='ticker', threads=True)
+    frames = {}
+    for symbol in symbols:
+        if data.empty or symbol not in data.columns.get_level_values(0):
+            frames[symbol] = pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        else:
+            frames[symbol] = data[symbol].dropna(how='all')
+    if any(frame.empty for frame in frames.values()):
+        raise EmptyDownloadError(frames)
+    return frames
+
 def add_indicators(df):
     close = df['Close']
     if isinstance(close, pd.DataFrame):
@@ -149,6 +186,16 @@ tabs = st.tabs(["Dashboard", "Backtest", "News/Sentiment", "Indicators Heatmap",
 # Import news and sentiment module
 from news_sentiment import get_news_with_sentiment
 
+# Widget interactions rerun the script; reuse recent results instead of re-hitting the news APIs.
+# A failed fetch raises instead of returning, so it is never cached and the next click retries.
+# API rejections (e.g. a bad key) raise NewsSourceError from the fetchers with the API's own message.
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def cached_news_with_sentiment(source, query):
+    results = get_news_with_sentiment(source=source, query=query)
+    if results is None:
+        raise RuntimeError(f"could not reach {source}, please try again")
+    return results
+
 with tabs[0]:
     if st.sidebar.button("Analyze & Predict"):
         with st.spinner('Fetching data and running analysis...'):
@@ -168,10 +215,14 @@ with tabs[0]:
                     import matplotlib.pyplot as plt
                     import io
                     fig, ax = plt.subplots(figsize=(8,4))
-                    mpf.plot(df.tail(60), type='candle', ax=ax, mav=(20,50), volume=True, style='yahoo')
-                    buf = io.BytesIO()
-                    plt.savefig(buf, format='png')
-                    st.image(buf)
+                    # The server process is long-lived; always release the figure, even if plotting fails
+                    try:
+                        mpf.plot(df.tail(60), type='candle', ax=ax, mav=(20,50), volume=True, style='yahoo')
+                        buf = io.BytesIO()
+                        fig.savefig(buf, format='png')
+                        st.image(buf)
+                    finally:
+                        plt.close(fig)
                 except ImportError:
                     st.line_chart(df[['Close', 'SMA20', 'SMA50', 'EMA20', 'EMA50']].dropna())
                 st.line_chart(df[['RSI', 'MACD', 'MACD_signal', 'ADX']].dropna())
@@ -267,7 +318,7 @@ with tabs[2]:
     if st.button("Fetch News & Sentiment"):
         with st.spinner("Fetching news and analyzing sentiment..."):
             try:
-                news_results = get_news_with_sentiment(source=news_source, query=news_query)
+                news_results = cached_news_with_sentiment(news_source, news_query)
                 if news_results:
                     for article in news_results:
                         st.markdown(f"**[{article['title']}]({article['url']})**")
@@ -289,8 +340,11 @@ with tabs[3]:
         indicators = ['SMA20','SMA50','EMA20','EMA50','RSI','MACD','MACD_signal','BB_High','BB_Low','Stoch_K','Stoch_D','ADX']
         corr = df[indicators].corr()
         fig, ax = plt.subplots()
-        sns.heatmap(corr, annot=True, cmap='coolwarm', ax=ax)
-        st.pyplot(fig)
+        try:
+            sns.heatmap(corr, annot=True, cmap='coolwarm', ax=ax)
+            st.pyplot(fig)
+        finally:
+            plt.close(fig)
     except Exception:
         st.info("Run an analysis to see the indicators heatmap.")
 
@@ -301,8 +355,9 @@ with tabs[4]:
 if st.sidebar.button("AI Portfolio Suggestion"):
     st.subheader(f"AI Portfolio Suggestion for {domain}")
     results = []
+    frames = fetch_data_batch(tuple(top_tickers), start_date, end_date)
     for ticker in top_tickers:
-        df = fetch_data(ticker, start_date, end_date)
+        df = frames[ticker]
         if df.empty:
             continue
         df = add_indicators(df)
@@ -332,7 +387,3 @@ if st.sidebar.button("AI Portfolio Suggestion"):
         st.caption("Companies with confidence > 0.5 are considered for investment. Allocation is proportional to AI confidence.")
     else:
         st.warning("No suitable companies found for this domain and date range.")
-
-# News API keys (for demonstration, these should be kept secret)
-NEWSAPI_KEY='your_newsapi_key'
-FINNHUB_KEY='your_finnhub_key'
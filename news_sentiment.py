@@ -1,55 +1,194 @@
 import requests
-from textblob import TextBlob
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import os
+import re
+import threading
+import time
+from functools import lru_cache
 from datetime import date, timedelta
 
+# Prefer orjson for parsing API responses; fall back to the stdlib parser
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    json_loads = json.loads
+
 load_dotenv()
 NEWSAPI_KEY = os.getenv("7d6403a5ede143aba79b36fc1df11fbd")
 FINNHUB_KEY = os.getenv("d1k251hr01ql1h3a6jo0d1k251hr01ql1h3a6jog")
 
+# ---------- Shared HTTP Session ----------
+# Reuse keep-alive connections to newsapi.org / finnhub.io across calls
+session = requests.Session()
+session.headers.update({"Accept-Encoding": "gzip"})
+# Only transient server errors are retried, and never by sleeping on Retry-After:
+# the Streamlit script thread would block for as long as the API asks
+session.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=[500, 502, 503, 504],
+        respect_retry_after_header=False,
+    ),
+))
+
+# Last good response per request, revalidated with ETag/Last-Modified so an
+# unchanged feed comes back as an empty 304 instead of a full JSON body.
+# Bodies are stored whole (Finnhub's can be hundreds of KB), so keep few of them.
+# Streamlit runs each session on its own thread, hence the lock.
+HTTP_CACHE_SIZE = 32
+http_cache = {}
+http_cache_lock = threading.Lock()
+
+def conditional_get(url, params):
+    key = (url, tuple(sorted(params.items())))
+    with http_cache_lock:
+        cached = http_cache.get(key)
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    response = session.get(url, params=params, headers=headers, timeout=10)
+    if response.status_code == 304 and cached is not None:
+        return 200, cached[2]
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if response.ok and (etag or last_modified):
+        with http_cache_lock:
+            http_cache.pop(key, None)
+            if len(http_cache) >= HTTP_CACHE_SIZE:
+                http_cache.pop(next(iter(http_cache)), None)
+            http_cache[key] = (etag, last_modified, response.content)
+    return response.status_code, response.content
+
+# Raised when a news API rejects the request (bad or missing key, bad query, quota),
+# as opposed to being unreachable; retrying the same request won't help
+class NewsSourceError(Exception):
+    pass
+
+def decode_json_object(content):
+    try:
+        data = json_loads(content)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
 # ---------- NewsAPI Function ----------
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
+NEWSAPI_PARAMS = {"language": "en", "pageSize": 5, "apiKey": NEWSAPI_KEY}
+
+# Fetchers return None when the service couldn't be reached (network error, 5xx, garbled body),
+# so callers can tell it apart from "no articles"; API rejections raise NewsSourceError
 def fetch_newsapi_news(query="stock market"):
-    url = f"https://newsapi.org/v2/everything?q={query}&language=en&pageSize=5&apiKey={NEWSAPI_KEY}"
-    response = requests.get(url)
-    data = response.json()
+    try:
+        status, content = conditional_get(NEWSAPI_URL, {**NEWSAPI_PARAMS, "q": query})
+    except requests.exceptions.RequestException:
+        return None
+    if status >= 500:
+        return None
+    data = decode_json_object(content)
+    if status >= 400 or (data is not None and data.get("status") == "error"):
+        data = data or {}
+        raise NewsSourceError(
+            f"NewsAPI rejected the request ({data.get('code', f'HTTP {status}')}): {data.get('message', 'no details given')}"
+        )
+    if data is None:
+        return None
     return data.get("articles", [])
 
 # ---------- Finnhub Function ----------
-def fetch_finnhub_news(symbol="AAPL"):
+FINNHUB_URL = "https://finnhub.io/api/v1/company-news"
+# Company news is keyed by ticker (e.g. AAPL, BRK.B); anything else can't match
+TICKER_RE = re.compile(r"[A-Z]{1,5}(?:[.-][A-Z]{1,2})?")
+
+# Recomputed at most once a minute; `minute` only serves as the cache key
+@lru_cache(maxsize=1)
+def finnhub_date_range(days_back, minute):
     today = date.today()
-    from_date = today - timedelta(days=3)
-    url = f"https://finnhub.io/api/v1/company-news?symbol={symbol}&from={from_date}&to={today}&token={FINNHUB_KEY}"
+    return (today - timedelta(days=days_back)).isoformat(), today.isoformat()
+
+def fetch_finnhub_news(symbol="AAPL", days_back=3, max_articles=20):
+    from_date, to_date = finnhub_date_range(days_back, int(time.monotonic() // 60))
+    params = {"symbol": symbol, "from": from_date, "to": to_date, "token": FINNHUB_KEY}
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        return []
+        status, content = conditional_get(FINNHUB_URL, params)
+    except requests.exceptions.RequestException:
+        return None
+    if 400 <= status < 500:
+        error = (decode_json_object(content) or {}).get("error", "no details given")
+        raise NewsSourceError(f"Finnhub rejected the request (HTTP {status}): {error}")
+    if status >= 500:
+        return None
+    try:
+        # Finnhub has no page size and returns every story in the window, newest first
+        return json_loads(content)[:max_articles]
+    except (ValueError, TypeError):
+        return None
 
 # ---------- Sentiment Analysis ----------
+# Same analyzer TextBlob(text).sentiment uses, without building a TextBlob per call.
+# Built on first use so importing this module doesn't pay for loading textblob/nltk.
+@lru_cache(maxsize=1)
+def get_sentiment_analyzer():
+    from textblob.en.sentiments import PatternAnalyzer
+    return PatternAnalyzer()
+
+# Headlines repeat across reruns and sources; score each distinct text once
+@lru_cache(maxsize=4096)
 def analyze_sentiment(text):
-    blob = TextBlob(text)
-    return blob.sentiment.polarity  # Range: -1 (negative) to 1 (positive)
+    return get_sentiment_analyzer().analyze(text).polarity  # Range: -1 (negative) to 1 (positive)
 
 # ---------- Combine and Display ----------
+# NewsAPI nests the source as {"name": ...}; Finnhub gives a plain string
+def article_source_name(article):
+    source = article.get("source", "")
+    return source.get("name", "") if isinstance(source, dict) else source
+
 def get_news_with_sentiment(source="newsapi", query="stocks"):
     if source == "newsapi":
         articles = fetch_newsapi_news(query)
     elif source == "finnhub":
-        articles = fetch_finnhub_news(query.upper())
+        symbol = query.strip().upper()
+        if not TICKER_RE.fullmatch(symbol):
+            return []
+        articles = fetch_finnhub_news(symbol)
     else:
         return []
+    if articles is None:
+        return None
 
-    result = []
+    # Wire stories are often returned more than once; keep the first copy of each URL (or title)
+    seen = set()
+    unique_articles = []
     for article in articles:
-        title = article.get("title", "")
-        description = article.get("description", "")
-        sentiment = analyze_sentiment(f"{title} {description}")
-        result.append({
-            "title": title,
+        key = article.get("url") or article.get("title")
+        # Articles with neither a URL nor a title can't be matched, so always keep them
+        if key:
+            if key in seen:
+                continue
+            seen.add(key)
+        unique_articles.append(article)
+    articles = unique_articles
+
+    # Score every article first, then build the result rows
+    texts = [f"{article.get('title', '')} {article.get('description', '')}" for article in articles]
+    sentiments = list(map(analyze_sentiment, texts))
+
+    return [
+        {
+            "title": article.get("title", ""),
             "sentiment": sentiment,
-            "source": article.get("source", {}).get("name", "") if isinstance(article.get("source"), dict) else article.get("source", ""),
+            "source": article_source_name(article),
             "url": article.get("url", "")
-        })
-    return result
+        }
+        for article, sentiment in zip(articles, sentiments)
+    ]